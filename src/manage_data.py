@@ -46,8 +46,11 @@ def init_project(project_name):
         },
         'processing_params': {
             'frame_extraction_interval_ms': 5000,
-            'blur_threshold': 100.0,
+            'blur_threshold': 100.0, # Laplacian variance of a 256x256 downsample; re-tune per camera
             'multispectral_band_for_stitching': 1, # Which band to use for feature matching
+            'feature_scale': 0.25, # Downscale factor for feature detection; warping uses full resolution
+            'camera_fov_deg': 84.0, # Horizontal field of view, used to find overlapping frames from GPS
+            'video_start_timestamps_ms': {}, # Video file name -> UTC start time in ms, to place frames on the flight log
         }
     }
     
@@ -3,12 +3,385 @@ import argparse
 import yaml
 import cv2
 import numpy as np
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pac
 import rasterio
 from rasterio.transform import from_gcps
 from rasterio.control import GroundControlPoint
+from rasterio.enums import Resampling
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
 import glob
+import hashlib
+import tempfile
+import zipfile
 import time
+import itertools
+import heapq
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+# GDAL settings shared by every raster read and write: a 512 MB block cache and
+# multi-threaded decoding of compressed tiles
+GDAL_ENV_OPTIONS = {'GDAL_CACHEMAX': 512, 'GDAL_NUM_THREADS': 'ALL_CPUS'}
+
+FLANN_INDEX_KDTREE = 1
+
+# Flight log columns used by the pipeline and their types. Timestamps are read as
+# floats since logs exported from pandas often write them with a decimal point
+FLIGHT_LOG_COLUMN_TYPES = {
+    'timestamp_ms': pa.float64(),
+    'latitude': pa.float64(),
+    'longitude': pa.float64(),
+    'altitude_m': pa.float64(),
+}
+
+# Columns a flight log must provide; altitude_m is optional
+FLIGHT_LOG_REQUIRED_COLUMNS = ('timestamp_ms', 'latitude', 'longitude')
+
+def load_flight_log(log_dir):
+    """
+    Combines all flight logs (.csv) in a directory into one DataFrame sorted by time.
+
+    Returns None if the directory has no flight logs, or after printing an error if a
+    log lacks one of the required columns or has no values in it.
+    """
+    flight_log_files = glob.glob(os.path.join(log_dir, '*.csv'))
+    if not flight_log_files:
+        return None
+    # pyarrow parses the CSVs multi-threaded straight into columnar buffers
+    convert_options = pac.ConvertOptions(column_types=FLIGHT_LOG_COLUMN_TYPES)
+    tables = []
+    for f in flight_log_files:
+        table = pac.read_csv(f, convert_options=convert_options)
+        missing = [c for c in FLIGHT_LOG_REQUIRED_COLUMNS if c not in table.column_names]
+        if missing:
+            print(f"Error: Flight log '{f}' is missing required column(s): {', '.join(missing)}")
+            return None
+        if 'altitude_m' not in table.column_names:
+            table = table.append_column('altitude_m', pa.nulls(len(table), pa.float64()))
+        # Keep only the known columns so logs with differing extra columns still concatenate
+        tables.append(table.select(list(FLIGHT_LOG_COLUMN_TYPES)))
+
+    df_log = pa.concat_tables(tables).to_pandas()
+    empty = [c for c in FLIGHT_LOG_REQUIRED_COLUMNS if df_log[c].isna().all()]
+    if empty:
+        print(f"Error: Flight logs in '{log_dir}' have no values for: {', '.join(empty)}")
+        return None
+    return df_log.sort_values(by='timestamp_ms', kind='mergesort', ignore_index=True)
+
+def _open_video(video_path):
+    """
+    Opens a video with hardware-accelerated decoding when available.
+
+    Acceleration requires OpenCV built against an ffmpeg compiled with
+    --enable-vaapi (Intel/AMD) or --enable-cuvid (NVIDIA); otherwise the
+    software decoder is used.
+    """
+    try:
+        # A specific CAP_PROP_HW_DEVICE is rejected together with VIDEO_ACCELERATION_ANY,
+        # so the backend picks the device itself
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+        ])
+        if cap.isOpened():
+            return cap
+        cap.release()
+    except (cv2.error, AttributeError):
+        # AttributeError: OpenCV < 4.5.2 has no hardware acceleration properties
+        pass
+    return cv2.VideoCapture(video_path)
+
+def _sharpness(frame):
+    """
+    Returns the Laplacian variance of the frame as a blur score.
+
+    The score is computed on a 256x256 downsample in float32, so its scale differs
+    from a full-resolution CV_64F Laplacian; blur_threshold is calibrated against it.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (256, 256), interpolation=cv2.INTER_AREA)
+    lap = cv2.Laplacian(small, cv2.CV_32F, ksize=3)
+    _, stddev = cv2.meanStdDev(lap)
+    return float(stddev[0, 0]) ** 2
+
+def _parse_frame_filename(frame_filename):
+    """Returns the (video file name, offset in milliseconds) encoded in an extracted frame's filename."""
+    stem = os.path.splitext(os.path.basename(frame_filename))[0]
+    video_name, offset_ms = stem[len('frame_'):].rsplit('_', 1)
+    return video_name, int(offset_ms)
+
+def _keep_if_sharp(frame, video_path, current_time_ms, frames_dir, params, writer):
+    """
+    Returns (filename, frame) if the frame passes the blur check, otherwise None.
+
+    The frame stays in memory for stitching; its JPEG copy is only written for
+    archival, in the background on the given writer executor.
+    """
+    if _sharpness(frame) <= params['blur_threshold']:
+        return None
+    frame_filename = os.path.join(frames_dir, f"frame_{os.path.basename(video_path)}_{int(current_time_ms)}.jpg")
+    writer.submit(cv2.imwrite, frame_filename, frame)
+    return frame_filename, frame
+
+def _scan_video_frames(cap, video_path, last_capture_time, frames_dir, params, writer):
+    """Walks the capture frame by frame, decoding only the frames due for sampling."""
+    extracted_frames = []
+    while True:
+        # grab() only advances the stream; frames are decoded with retrieve() when sampled
+        ret = cap.grab()
+        if not ret: break
+
+        current_time_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if current_time_ms >= last_capture_time + params['frame_extraction_interval_ms']:
+            ret, frame = cap.retrieve()
+            if not ret: continue
+            kept = _keep_if_sharp(frame, video_path, current_time_ms, frames_dir, params, writer)
+            if kept:
+                extracted_frames.append(kept)
+                last_capture_time = current_time_ms
+    return extracted_frames
+
+def _extract_one_video(video_path, params, frames_dir):
+    """
+    Extracts sharp frames from a single video at the configured interval.
+
+    Kept at module level so it can be dispatched to worker processes.
+    Returns a list of (filename, frame) tuples.
+    """
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        return _sample_video(video_path, frames_dir, params, writer)
+
+def _sample_video(video_path, frames_dir, params, writer):
+    """Seeks through the video at the sampling interval, collecting sharp frames."""
+    interval = params['frame_extraction_interval_ms']
+    extracted_frames = []
+    cap = _open_video(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_ms = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps * 1000 if fps > 0 else 0
+    if total_ms <= 0:
+        # Duration unknown (e.g. fragmented or streamed MP4): seeking has no bounds, so scan linearly
+        extracted_frames = _scan_video_frames(cap, video_path, -interval, frames_dir, params, writer)
+        cap.release()
+        return extracted_frames
+
+    # Seek straight to each sampling target instead of decoding every frame
+    target_ms = 0
+    while target_ms < total_ms:
+        cap.set(cv2.CAP_PROP_POS_MSEC, target_ms)
+        ret, frame = cap.read()
+        if not ret: break
+
+        current_time_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if abs(current_time_ms - target_ms) > interval / 2:
+            # Inaccurate seek (e.g. variable frame rate): scan the rest linearly
+            print(f"Warning: Seeking is unreliable for {os.path.basename(video_path)}, falling back to a linear scan.")
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            extracted_frames.extend(_scan_video_frames(cap, video_path, target_ms - interval, frames_dir, params, writer))
+            break
+
+        # A blurry sample falls through to the following frames until one is sharp enough
+        next_target_ms = target_ms + interval
+        while ret and current_time_ms < next_target_ms:
+            kept = _keep_if_sharp(frame, video_path, current_time_ms, frames_dir, params, writer)
+            if kept:
+                extracted_frames.append(kept)
+                next_target_ms = current_time_ms + interval
+                break
+            ret, frame = cap.read()
+            current_time_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        target_ms = next_target_ms
+    cap.release()
+    return extracted_frames
+
+class _CudaOrbDetector:
+    """Runs ORB on the GPU behind the detectAndCompute interface of the CPU detectors."""
+
+    def __init__(self, nfeatures=4000):
+        self._orb = cv2.cuda.ORB_create(nfeatures=nfeatures)
+        self._gpu_img = cv2.cuda_GpuMat()
+
+    def detectAndCompute(self, image, mask):
+        self._gpu_img.upload(image)
+        gpu_keypoints, gpu_descriptors = self._orb.detectAndComputeAsync(self._gpu_img, None)
+        keypoints = self._orb.convert(gpu_keypoints)
+        descriptors = gpu_descriptors.download() if not gpu_descriptors.empty() else None
+        return keypoints, descriptors
+
+class _CudaHammingMatcher:
+    """Brute-force Hamming matcher for binary descriptors, run on the GPU."""
+
+    def __init__(self):
+        self._matcher = cv2.cuda.DescriptorMatcher_createBFMatcher(cv2.NORM_HAMMING)
+
+    def knnMatch(self, query_descriptors, train_descriptors, k):
+        return self._matcher.knnMatch(cv2.cuda_GpuMat(query_descriptors), cv2.cuda_GpuMat(train_descriptors), k)
+
+def _cuda_available():
+    """Returns True if OpenCV was built with CUDA and a device is present."""
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (cv2.error, AttributeError):
+        return False
+
+def _create_feature_pipeline():
+    """
+    Returns (create_detector, matcher) for registration.
+
+    Uses ORB with a Hamming matcher on the GPU when a CUDA device is available, and
+    falls back to SIFT with a KD-tree FLANN matcher on the CPU otherwise. Detectors
+    are created through the factory because instances must not be shared across threads.
+    """
+    if _cuda_available():
+        print("Using CUDA ORB features for registration.")
+        return _CudaOrbDetector, _CudaHammingMatcher()
+    return cv2.SIFT_create, cv2.FlannBasedMatcher(dict(algorithm=FLANN_INDEX_KDTREE, trees=5), dict(checks=50))
+
+def _detect_features(image, detector, scale=1.0):
+    """
+    Detects keypoints and descriptors on an image downscaled by the given factor.
+
+    Returns (points, descriptors), where points is an (N, 2) float32 array of
+    keypoint coordinates mapped back to full resolution.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    if scale != 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    keypoints, descriptors = detector.detectAndCompute(gray, None)
+    points = np.float32([kp.pt for kp in keypoints]).reshape(-1, 2) / scale
+    return points, descriptors
+
+def _cached_features(image, detector, scale, cache_dir):
+    """
+    Returns _detect_features for the image, reusing the result of a previous run if cached.
+
+    Entries are keyed by the pixel content together with the detector and scale, so
+    re-runs with other downstream parameters skip detection while a change in
+    detection settings never reuses stale features.
+    """
+    digest = hashlib.sha256(image.tobytes())
+    digest.update(f"{image.shape}{type(detector).__name__}{scale}".encode())
+    cache_path = os.path.join(cache_dir, f"feat_{digest.hexdigest()[:16]}.npz")
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as data:
+                descriptors = data['des']
+                return data['pts'], (descriptors if len(descriptors) else None)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # Corrupt or unreadable entry: treat it as a miss and overwrite it
+            pass
+
+    points, descriptors = _detect_features(image, detector, scale)
+
+    # Write to a temporary file and move it into place, so an interrupted run never
+    # leaves a truncated entry behind
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.npz.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, pts=points, des=descriptors if descriptors is not None else np.empty((0, 0), np.float32))
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return points, descriptors
+
+def _match_pair(features_dst, features_src, matcher, reproj_threshold=3.0, ratio=0.75, min_inliers=10):
+    """
+    Matches two images and estimates the homography mapping src onto dst.
+
+    Returns (H, num_inliers), or (None, 0) if the images do not overlap reliably.
+    """
+    pts_dst, des_dst = features_dst
+    pts_src, des_src = features_src
+    if des_dst is None or des_src is None or len(des_dst) < 2 or len(des_src) < 2:
+        return None, 0
+
+    # Lowe's ratio test on the two nearest neighbours
+    knn_matches = matcher.knnMatch(des_src, des_dst, k=2)
+    good = [m[0] for m in knn_matches if len(m) == 2 and m[0].distance < ratio * m[1].distance]
+    if len(good) < min_inliers:
+        return None, 0
+
+    src_pts = pts_src[[m.queryIdx for m in good]].reshape(-1, 1, 2)
+    dst_pts = pts_dst[[m.trainIdx for m in good]].reshape(-1, 1, 2)
+    # MAGSAC++ converges in fewer iterations than plain RANSAC on ratio-filtered matches
+    H, mask = cv2.findHomography(src_pts, dst_pts, cv2.USAC_MAGSAC, reproj_threshold, maxIters=2000, confidence=0.999)
+    if H is None:
+        return None, 0
+    num_inliers = int(mask.sum())
+    if num_inliers < min_inliers:
+        return None, 0
+    return H, num_inliers
+
+def _chain_homographies(num_images, pair_homographies):
+    """
+    Resolves the pairwise homographies into one homography per image.
+
+    pair_homographies maps (i, j) to (H, num_inliers), with H mapping image j onto
+    image i. The best connected image is used as the reference frame and the others
+    are attached along a maximum spanning tree of inlier counts, so every image is
+    registered through its strongest chain of overlaps. Images with no overlap are
+    left out of the result.
+    """
+    if num_images == 0:
+        return {}
+    neighbours = {idx: [] for idx in range(num_images)}
+    for (i, j), (H, num_inliers) in pair_homographies.items():
+        neighbours[i].append((num_inliers, j, H))
+        neighbours[j].append((num_inliers, i, np.linalg.inv(H)))
+
+    reference = max(neighbours, key=lambda idx: sum(n for n, _, _ in neighbours[idx]))
+    homographies = {reference: np.eye(3)}
+    heap = [(-n, nbr, reference, H) for n, nbr, H in neighbours[reference]]
+    heapq.heapify(heap)
+    while heap:
+        _, idx, parent, H = heapq.heappop(heap)
+        if idx in homographies:
+            continue
+        homographies[idx] = homographies[parent] @ H
+        for n, nbr, H_nbr in neighbours[idx]:
+            if nbr not in homographies:
+                heapq.heappush(heap, (-n, nbr, idx, H_nbr))
+    return homographies
+
+def _warp_and_blend(images, homographies, max_canvas_pixels=400_000_000):
+    """Warps the registered images onto a common canvas and feather-blends the overlaps."""
+    corners = {}
+    for idx, H in homographies.items():
+        h, w = images[idx].shape[:2]
+        quad = np.float32([[0, 0], [w, 0], [w, h], [0, h]]).reshape(-1, 1, 2)
+        corners[idx] = cv2.perspectiveTransform(quad, H).reshape(-1, 2)
+
+    all_corners = np.concatenate(list(corners.values()))
+    x_min, y_min = np.floor(all_corners.min(axis=0)).astype(int)
+    x_max, y_max = np.ceil(all_corners.max(axis=0)).astype(int)
+    if (x_max - x_min) * (y_max - y_min) > max_canvas_pixels:
+        print("Error: Estimated mosaic is implausibly large; image registration is likely wrong.")
+        return None
+
+    blender = cv2.detail.Blender_createDefault(cv2.detail.Blender_FEATHER)
+    blender.prepare((int(x_min), int(y_min), int(x_max - x_min), int(y_max - y_min)))
+    for idx, H in homographies.items():
+        image = images[idx]
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+        # Warp each image only into its own bounding box on the canvas
+        x0, y0 = np.floor(corners[idx].min(axis=0)).astype(int)
+        x1, y1 = np.ceil(corners[idx].max(axis=0)).astype(int)
+        shift = np.array([[1, 0, -x0], [0, 1, -y0], [0, 0, 1]], dtype=np.float64)
+        size = (int(x1 - x0), int(y1 - y0))
+        warped = cv2.warpPerspective(image, shift @ H, size)
+        mask = cv2.warpPerspective(np.full(image.shape[:2], 255, np.uint8), shift @ H, size, flags=cv2.INTER_NEAREST)
+        blender.feed(warped.astype(np.int16), mask, (int(x0), int(y0)))
+
+    result, _ = blender.blend(None, None)
+    result = cv2.convertScaleAbs(result)
+    if all(images[idx].ndim == 2 for idx in homographies):
+        result = cv2.cvtColor(result, cv2.COLOR_BGR2GRAY)
+    return result
 
 class ProcessingPipeline:
     def __init__(self, project_name):
@@ -30,27 +403,34 @@ class ProcessingPipeline:
         start_time = time.time()
         print(f"--- Starting pipeline for project: {self.project_name} ---")
 
-        # Step 1: Prepare image frames
-        image_files = self._prepare_frames()
-        if not image_files:
-            print("Pipeline stopped: No valid frames to process.")
-            return
+        # A single GDAL environment for the whole run, rather than one per raster open
+        with rasterio.Env(**GDAL_ENV_OPTIONS):
+            # Step 1: Prepare image frames
+            image_files = self._prepare_frames()
+            if not image_files:
+                print("Pipeline stopped: No valid frames to process.")
+                return
 
-        # Step 2: Stitch images
-        stitched_image = self._stitch_images(image_files)
-        if stitched_image is None:
-            print("Pipeline stopped: Stitching failed.")
-            return
+            # Step 2: Stitch images
+            stitched_image = self._stitch_images(image_files)
+            if stitched_image is None:
+                print("Pipeline stopped: Stitching failed.")
+                return
 
-        # Step 3: Georeference the stitched image
-        self._georeference_image(stitched_image)
+            # Step 3: Georeference the stitched image
+            self._georeference_image(stitched_image)
 
         end_time = time.time()
         print(f"--- Pipeline finished in {end_time - start_time:.2f} seconds ---")
 
 
     def _prepare_frames(self):
-        """Prepares a list of image file paths to be processed."""
+        """
+        Prepares the images to be processed.
+
+        Returns (filename, frame) tuples for video sources, whose frames are kept in
+        memory, and a list of file paths for multispectral/hyperspectral sources.
+        """
         data_type = self.config.get('data_type', 'rgb_video')
         print(f"Processing data type: {data_type}")
 
@@ -68,34 +448,20 @@ class ProcessingPipeline:
             return []
 
     def _extract_video_frames(self):
-        """Extracts frames from all videos in the rgb_video directory."""
+        """Extracts frames from all videos in the rgb_video directory as (filename, frame) tuples."""
         video_files = glob.glob(os.path.join(self.paths['rgb_video'], '*.mp4'))
         if not video_files:
             print("Error: No video files (.mp4) found.")
             return []
 
         print(f"Found {len(video_files)} video(s). Extracting frames...")
-        extracted_frames = []
-        for video_path in video_files:
-            cap = cv2.VideoCapture(video_path)
-            last_capture_time = -self.params['frame_extraction_interval_ms']
-            
-            while True:
-                ret, frame = cap.read()
-                if not ret: break
-                
-                current_time_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
-                if current_time_ms >= last_capture_time + self.params['frame_extraction_interval_ms']:
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    if cv2.Laplacian(gray, cv2.CV_64F).var() > self.params['blur_threshold']:
-                        frame_filename = os.path.join(self.paths['frames'], f"frame_{os.path.basename(video_path)}_{int(current_time_ms)}.jpg")
-                        cv2.imwrite(frame_filename, frame)
-                        extracted_frames.append(frame_filename)
-                        last_capture_time = current_time_ms
-            cap.release()
-        
+        # Videos are independent, so decode them in separate processes
+        with ProcessPoolExecutor(max_workers=min(len(video_files), os.cpu_count() or 1)) as executor:
+            results = executor.map(partial(_extract_one_video, params=self.params, frames_dir=self.paths['frames']), video_files)
+            extracted_frames = list(itertools.chain.from_iterable(results))
+
         print(f"Extracted {len(extracted_frames)} high-quality frames.")
-        return sorted(extracted_frames)
+        return sorted(extracted_frames, key=lambda item: item[0])
 
     def _stitch_images(self, image_files):
         """Stitches a list of images into a single panorama."""
@@ -111,15 +477,54 @@ class ProcessingPipeline:
             # e.g., image_001_band1.tif, image_002_band1.tif
             ref_band_id = self.params['multispectral_band_for_stitching']
             ref_images_paths = [f for f in image_files if f"band{ref_band_id}" in f]
-            images_to_stitch = [cv2.imread(p, cv2.IMREAD_GRAYSCALE) for p in ref_images_paths]
+            # TIFF decoding releases the GIL, so reads overlap across threads
+            with ThreadPoolExecutor(max_workers=min(16, (os.cpu_count() or 1) * 2)) as executor:
+                images_to_stitch = list(executor.map(lambda p: cv2.imread(p, cv2.IMREAD_GRAYSCALE), ref_images_paths))
+        elif isinstance(image_files[0], tuple): # RGB frames already decoded in memory
+            images_to_stitch = [frame for _, frame in image_files]
         else: # RGB
             images_to_stitch = [cv2.imread(f) for f in image_files]
 
-        stitcher = cv2.Stitcher.create(cv2.Stitcher_PANORAMA)
-        status, stitched_image = stitcher.stitch(images_to_stitch)
+        if len(images_to_stitch) < 2:
+            print("Error: Need at least two images to stitch.")
+            return None
+
+        # Only match frames that the flight log places near each other
+        candidate_pairs = self._candidate_pairs(image_files) if isinstance(image_files[0], tuple) else None
+        if candidate_pairs is None:
+            candidate_pairs = itertools.combinations(range(len(images_to_stitch)), 2)
+
+        # Detect features once per image, then match and register the candidate pairs
+        # Features come from a downscaled copy; homographies and warping stay at full resolution
+        scale = self.params.get('feature_scale', 0.25)
+        create_detector, matcher = _create_feature_pipeline()
+        cache_dir = os.path.join(self.output_dir, '.featcache')
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Detection releases the GIL, so run it on a thread pool with one detector per thread
+        thread_state = threading.local()
+        def detect(img):
+            if not hasattr(thread_state, 'detector'):
+                thread_state.detector = create_detector()
+            return _cached_features(img, thread_state.detector, scale, cache_dir)
 
-        if status != cv2.Stitcher_OK:
-            print(f"Stitching failed with status code: {status}")
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+            features = list(executor.map(detect, images_to_stitch))
+        pair_homographies = {}
+        for i, j in candidate_pairs:
+            H, num_inliers = _match_pair(features[i], features[j], matcher, reproj_threshold=3.0 / scale)
+            if H is not None:
+                pair_homographies[(i, j)] = (H, num_inliers)
+
+        homographies = _chain_homographies(len(images_to_stitch), pair_homographies)
+        if len(homographies) < 2:
+            print("Stitching failed: Not enough overlapping images could be registered.")
+            return None
+        if len(homographies) < len(images_to_stitch):
+            print(f"Warning: {len(images_to_stitch) - len(homographies)} image(s) could not be registered and were skipped.")
+
+        stitched_image = _warp_and_blend(images_to_stitch, homographies)
+        if stitched_image is None:
             return None
 
         print("Stitching successful. Cropping black borders...")
@@ -133,18 +538,80 @@ class ProcessingPipeline:
         
         return stitched_image
 
+    def _load_flight_log(self):
+        """Combines all flight logs into one DataFrame sorted by time, or returns None if there are none."""
+        return load_flight_log(self.paths['flight_logs'])
+
+    def _candidate_pairs(self, frames):
+        """
+        Returns the index pairs of video frames whose ground footprints can overlap.
+
+        Each frame is located by interpolating the flight log at its video's start time
+        plus the frame's offset into the video. Start times come from the
+        video_start_timestamps_ms mapping (video file name to UTC milliseconds); a lone
+        video without an entry is assumed to start with the log. The search radius is
+        match_radius_m, or else the footprint width derived from the flight height
+        above the lowest logged altitude and the camera field of view.
+
+        Returns None, meaning every pair should be matched, when frames cannot be
+        located reliably or when the radius leaves some frames without a path to the
+        others.
+        """
+        try:
+            df_log = self._load_flight_log()
+        except (pa.ArrowInvalid, OSError) as e:
+            # The pre-filter is only an optimisation, so an unreadable log must not stop stitching
+            print(f"GPS pre-filter skipped: could not read the flight log ({e}).")
+            return None
+        if df_log is None:
+            return None
+
+        log_ms = df_log['timestamp_ms'].to_numpy(dtype=np.float64)
+        video_starts = dict(self.params.get('video_start_timestamps_ms') or {})
+        videos = {_parse_frame_filename(f)[0] for f, _ in frames}
+        untimed = videos - set(video_starts)
+        if len(untimed) > 1 or (untimed and len(videos) > 1):
+            print("GPS pre-filter skipped: set video_start_timestamps_ms to place frames from several videos.")
+            return None
+        for video in untimed:
+            video_starts[video] = log_ms[0]
+
+        frame_ms = np.array([video_starts[video] + offset_ms
+                             for video, offset_ms in (_parse_frame_filename(f) for f, _ in frames)], dtype=np.float64)
+        lat = np.interp(frame_ms, log_ms, df_log['latitude'].to_numpy(dtype=np.float64))
+        lon = np.interp(frame_ms, log_ms, df_log['longitude'].to_numpy(dtype=np.float64))
+
+        radius = self.params.get('match_radius_m')
+        if not radius:
+            height = df_log['altitude_m'].median() - df_log['altitude_m'].min()
+            radius = 2 * height * np.tan(np.radians(self.params.get('camera_fov_deg', 84.0)) / 2)
+        if not radius > 0:
+            return None
+
+        # An equirectangular projection to metres is accurate enough over a single flight
+        xy = np.column_stack([lon * 111320.0 * np.cos(np.radians(lat.mean())), lat * 110540.0])
+        pairs = sorted(cKDTree(xy).query_pairs(r=radius))
+
+        # A radius that is too small (e.g. a log starting in the air) or a wrong start
+        # time splits the frames into islands that could never be registered together
+        edges = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        graph = coo_matrix((np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(len(frames), len(frames)))
+        num_components, _ = connected_components(graph, directed=False)
+        if num_components > 1:
+            print(f"GPS pre-filter skipped: a {radius:.1f} m radius leaves the frames in {num_components} disconnected groups.")
+            return None
+
+        print(f"GPS pre-filter kept {len(pairs)} candidate image pairs within {radius:.1f} m.")
+        return pairs
+
     def _georeference_image(self, stitched_image):
         """Assigns geographic coordinates to the final image."""
         print("Starting georeferencing...")
-        flight_log_files = glob.glob(os.path.join(self.paths['flight_logs'], '*.csv'))
-        if not flight_log_files:
-            print("Error: No flight log (.csv) found.")
+        df_log = self._load_flight_log()
+        if df_log is None:
+            print("Error: No usable flight log (.csv) found.")
             return
 
-        # Combine all flight logs into one DataFrame
-        df_log = pd.concat([pd.read_csv(f) for f in flight_log_files])
-        df_log = df_log.sort_values(by='timestamp_ms').reset_index(drop=True)
-
         h, w = stitched_image.shape[:2]
         
         # Simplified GCP logic using the full time range of the flight log
@@ -168,9 +635,12 @@ class ProcessingPipeline:
         num_bands = stitched_image.shape[2] if len(stitched_image.shape) == 3 else 1
         output_path = os.path.join(self.output_dir, 'stitched_georeferenced.tif')
 
+        # Tiled, compressed layout with internal overviews so viewers can read windows
+        # and low zoom levels without decoding the whole mosaic
         with rasterio.open(
             output_path, 'w', driver='GTiff', height=h, width=w,
-            count=num_bands, dtype=stitched_image.dtype, crs='EPSG:4326', transform=transform
+            count=num_bands, dtype=stitched_image.dtype, crs='EPSG:4326', transform=transform,
+            tiled=True, blockxsize=512, blockysize=512, compress='DEFLATE', num_threads='all_cpus'
         ) as dst:
             if num_bands == 1:
                 dst.write(stitched_image, 1)
@@ -178,7 +648,14 @@ class ProcessingPipeline:
                 # This is a simplification. For true multispectral, you would apply the
                 # calculated warp to each band individually and stack them.
                 # Here we just save the RGB stitched result.
-                dst.write(stitched_image.transpose(2, 0, 1))
+                # Band-by-band writes avoid materialising a transposed copy of the mosaic.
+                for i in range(num_bands):
+                    dst.write(stitched_image[:, :, i], i + 1)
+
+            overview_factors = [f for f in (2, 4, 8, 16, 32) if max(h, w) // f >= 256]
+            if overview_factors:
+                dst.build_overviews(overview_factors, Resampling.average)
+                dst.update_tags(ns='rio_overview', resampling='average')
 
         print(f"Georeferenced GeoTIFF saved to: {output_path}")
 
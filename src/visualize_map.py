@@ -1,14 +1,24 @@
 import os
 import argparse
+import cv2
 import folium
 import rasterio
+from rasterio.enums import Resampling
 from folium.raster_layers import ImageOverlay
-import pandas as pd
-import base64
 from PIL import Image
 import numpy as np
-import io
-import glob
+from shapely.geometry import LineString
+import pathlib
+from process_pipeline import load_flight_log
+
+# GDAL block cache size (MB) and multi-threaded decoding for the GeoTIFF read
+GDAL_ENV_OPTIONS = {'GDAL_CACHEMAX': 512, 'GDAL_NUM_THREADS': 'ALL_CPUS'}
+
+# Longest side, in pixels, of the image overlaid on the map
+MAX_OVERLAY_DIM = 2048
+
+# Flight path simplification tolerance, about 1 m
+FLIGHT_PATH_TOLERANCE_DEG = 1e-5
 
 def create_map(project_name):
     """
@@ -17,30 +27,45 @@ def create_map(project_name):
     output_dir = os.path.join('output', project_name)
     geotiff_path = os.path.join(output_dir, 'stitched_georeferenced.tif')
     map_output_path = os.path.join(output_dir, 'field_map.html')
+    overlay_filename = 'field_map_overlay.png'
+    overlay_path = os.path.join(output_dir, overlay_filename)
     
     if not os.path.exists(geotiff_path):
         print(f"Error: GeoTIFF not found for project '{project_name}'. Please run 'process_pipeline.py' first.")
         return
 
     # --- Read GeoTIFF to get bounds and image data ---
-    with rasterio.open(geotiff_path) as src:
+    with rasterio.Env(**GDAL_ENV_OPTIONS), rasterio.open(geotiff_path) as src:
         bounds = src.bounds
         map_bounds = [[bounds.bottom, bounds.left], [bounds.top, bounds.right]]
         
+        # The overlay only needs browser resolution, so let GDAL decimate the read
+        # (using the GeoTIFF's overviews) instead of decoding the full mosaic
+        scale = max(1, -(-max(src.width, src.height) // MAX_OVERLAY_DIM))
+        out_size = (max(1, src.height // scale), max(1, src.width // scale))
+
         # Read image data and convert to a displayable format (e.g., RGB)
         if src.count >= 3:
             # Read the first 3 bands as RGB
-            img_array = src.read((1, 2, 3))
+            img_array = src.read((1, 2, 3), out_shape=(3, *out_size), resampling=Resampling.average)
+            img_array = np.moveaxis(img_array, 0, -1)
+
+            # Normalize for display if not standard 8-bit; OpenCV scales straight to
+            # uint8 without a float64 intermediate
+            if img_array.dtype != np.uint8:
+                img_array = cv2.normalize(img_array, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
         else:
-            # For single-band images, duplicate to create a grayscale image
-            band = src.read(1)
-            img_array = np.stack([band, band, band], axis=0)
-        
-        # Normalize for display if not standard 8-bit
-        if img_array.dtype != np.uint8:
-            img_array = (255 * (img_array / img_array.max())).astype(np.uint8)
+            band = src.read(1, out_shape=out_size, resampling=Resampling.average)
 
-        img_array = np.moveaxis(img_array, 0, -1)
+            # Quantize the single band to 8 bits before duplicating it, so only the
+            # uint8 copy is ever tripled
+            if band.dtype != np.uint8:
+                lo, hi, _, _ = cv2.minMaxLoc(band)
+                span = hi - lo + 1e-9
+                band = cv2.convertScaleAbs(band, alpha=255.0 / span, beta=-255.0 * lo / span)
+
+            # For single-band images, duplicate to create a grayscale image
+            img_array = cv2.merge((band, band, band))
 
     # --- Calculate map center ---
     center_lat = (bounds.bottom + bounds.top) / 2
@@ -49,26 +74,30 @@ def create_map(project_name):
     # --- Create Folium map ---
     m = folium.Map(location=[center_lat, center_lon], zoom_start=18, tiles='https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', attr='&copy; OpenStreetMap contributors')
 
-    # --- Convert image to base64 for embedding ---
+    # --- Save image as a side-car file next to the HTML instead of embedding it ---
     img = Image.fromarray(img_array)
-    buffered = io.BytesIO()
-    img.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    image_overlay_url = f"data:image/png;base64,{img_str}"
+    img.save(overlay_path, format="PNG", optimize=False, compress_level=1)
 
-    ImageOverlay(
-        image=image_overlay_url,
+    # folium inlines local file paths as base64, so pass a URL and then link the
+    # overlay relative to the HTML to keep the output folder portable
+    overlay = ImageOverlay(
+        image=pathlib.Path(overlay_path).absolute().as_uri(),
         bounds=map_bounds,
         opacity=0.8,
         name='无人机拼接影像 (Drone Panorama)'
-    ).add_to(m)
+    )
+    overlay.url = overlay_filename
+    overlay.add_to(m)
 
     # --- Add flight path ---
-    flight_log_dir = os.path.join('data', project_name, 'flight_logs')
-    log_files = glob.glob(os.path.join(flight_log_dir, '*.csv'))
-    if log_files:
-        df_log = pd.concat([pd.read_csv(f) for f in log_files])
-        points = df_log[['latitude', 'longitude']].dropna().values.tolist()
+    df_log = load_flight_log(os.path.join('data', project_name, 'flight_logs'))
+    if df_log is not None:
+        points = df_log[['longitude', 'latitude']].dropna().values
+        if len(points) >= 2:
+            # Douglas-Peucker simplification keeps the HTML small; the tolerance is in degrees
+            line = LineString(points).simplify(FLIGHT_PATH_TOLERANCE_DEG, preserve_topology=False)
+            points = line.coords
+        points = [(lat, lon) for lon, lat in points]
         folium.PolyLine(points, color="red", weight=2.5, opacity=1, tooltip="飞行轨迹 (Flight Path)").add_to(m)
         print("Added flight path to the map.")
 